@@ -0,0 +1,75 @@
+import argparse
+import math
+
+from flamapy.metamodels.configuration_metamodel.models import Configuration
+from flamapy.metamodels.fm_metamodel.transformations import UVLReader
+from flamapy.metamodels.bdd_metamodel.transformations import FmToBDD
+
+from fm_sublog.models import FUSION_OPERATORS
+from fm_sublog import utils
+from fm_sublog import fm_utils
+from fm_sublog import product_statistics
+from fm_sublog.evaluation_utils import timer
+
+
+TIME_STATISTICS = 'TIME_STATISTICS'
+TIME_RANKING = 'TIME_RANKING'
+
+
+def main(fm_path: str, opinions_path: str, fusion_operator: str, strong_opinions: bool, threshold: float, n_bins: int, check: bool):
+    fm = UVLReader(fm_path).transform()
+    opinions = utils.read_opinions(opinions_path, strong_opinions)
+
+    with timer.Timer(name=TIME_STATISTICS, logger=None):
+        bdd_model = FmToBDD(fm).transform()
+        stats = product_statistics.get_product_statistics(bdd_model, opinions, FUSION_OPERATORS[fusion_operator])
+
+    print(f'#Features: {len(fm.get_features())}')
+    print(f'#Constraints: {len(fm.get_constraints())}')
+    print(f'#Products: {stats.n_products()}')
+    print(f'Mean projection: {stats.mean_projection()}')
+    print(f'Max projection: {stats.max_projection()}')
+    print(f'Min projection: {stats.min_projection()}')
+    print(f'#Products above {threshold}: {stats.n_products_above(threshold)}')
+    print(f'Projection histogram ({n_bins} bins): {stats.projection_histogram(n_bins)}')
+    print(f'Time (statistics): {round(timer.Timer.timers[TIME_STATISTICS], 4)} s.')
+
+    if check:
+        with timer.Timer(name=TIME_RANKING, logger=None):
+            products = [Configuration({f: True for f in p}) for p in fm_utils.generate_products(fm)]
+            rank = utils.rank_products(products, opinions, FUSION_OPERATORS[fusion_operator])
+        projections = [v[1] for _, v in rank]
+        if len(rank) != stats.n_products():
+            exit(f'Check against ranking failed. #Products: {len(rank)} (ranking) != {stats.n_products()} (statistics)')
+        if not rank:
+            if stats.mean_projection() is not None or stats.max_projection() is not None or stats.min_projection() is not None:
+                exit(f'Check against ranking failed. Projections of a model without products: {stats.mean_projection()}/{stats.max_projection()}/{stats.min_projection()} (statistics) != None')
+        elif not math.isclose(math.fsum(projections) / len(rank), stats.mean_projection()):
+            exit(f'Check against ranking failed. Mean projection: {math.fsum(projections) / len(rank)} (ranking) != {stats.mean_projection()} (statistics)')
+        elif projections[0] != stats.max_projection() or projections[-1] != stats.min_projection():
+            exit(f'Check against ranking failed. Max/min projections: {projections[0]}/{projections[-1]} (ranking) != {stats.max_projection()}/{stats.min_projection()} (statistics)')
+        n_above = sum(p > threshold for p in projections)
+        if n_above != stats.n_products_above(threshold):
+            exit(f'Check against ranking failed. #Products above {threshold}: {n_above} (ranking) != {stats.n_products_above(threshold)} (statistics)')
+        print('Check against ranking: OK')
+        print(f'Time (ranking): {round(timer.Timer.timers[TIME_RANKING], 4)} s.')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Exact aggregate statistics of the fused stakeholder's opinions over all products of the feature model, computed over its BDD without enumerating the products.")
+    parser.add_argument('-fm', '--featuremodel', dest='feature_model', type=str, required=True, help='Feature model (.uvl).')
+    parser.add_argument('-o', '--opinions', dest='opinions', type=str, required=True, help="Stakeholders' opinions (.csv).")
+    parser.add_argument('-f', '--fusion_operator', dest='fusion_operator', type=str, required=False, default='ABF', help=f'Fusion operator: {[f for f in FUSION_OPERATORS.keys()]} (default ABF). ')
+    parser.add_argument('-s', '--strong_opinions', dest='strong_opinions', action='store_true', required=False, default=False, help="Consider strong degrees of uncertainty for stakelholder's opinions (default moderate).")
+    parser.add_argument('-t', '--threshold', dest='threshold', required=False, type=float, default=0.5, help="Threshold for counting the products (default 0.5).")
+    parser.add_argument('-b', '--bins', dest='n_bins', required=False, type=int, default=10, help="Number of buckets of the projection histogram (default 10).")
+    parser.add_argument('-c', '--check', dest='check', action='store_true', required=False, default=False, help="Cross-check the statistics against the ranking of all products (only for small models).")
+    args = parser.parse_args()
+
+    if args.fusion_operator not in FUSION_OPERATORS:
+        exit(f'Invalid fusion operator {args.fusion_operator}. Use one of {[f for f in FUSION_OPERATORS]}')
+
+    if args.n_bins <= 0:
+        exit(f'Invalid number of bins {args.n_bins}. It must be greater than 0')
+
+    main(args.feature_model, args.opinions, args.fusion_operator, args.strong_opinions, args.threshold, args.n_bins, args.check)
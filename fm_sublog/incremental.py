@@ -0,0 +1,245 @@
+import heapq
+
+from uncertainty.utypes import sbool
+
+from flamapy.metamodels.fm_metamodel.models import FeatureModel, Relation, Constraint
+from flamapy.metamodels.configuration_metamodel.models import Configuration
+
+from fm_sublog.models import FMOpinion, FUSION_OPERATORS
+from fm_sublog import utils
+from fm_sublog import fm_utils
+
+
+def relation_key(relation: Relation) -> tuple:
+    return (relation.parent.name, tuple(sorted(c.name for c in relation.children)), relation.card_min, relation.card_max)
+
+
+def constraint_key(constraint: Constraint) -> str:
+    return constraint.ast.pretty_str()
+
+
+def opinion_key(opinion: FMOpinion) -> tuple:
+    op = opinion.opinion
+    return (op.belief, op.disbelief, op.uncertainty, op.base_rate, opinion.fusion_operator)
+
+
+def get_opinion_features(opinions: dict[str, dict[str, FMOpinion]]) -> set[str]:
+    """Return the names of the elements with an opinion of any stakeholder."""
+    return {f for stakeholder in opinions.values() for f in stakeholder.keys()}
+
+
+class FeatureModelDiff():
+    """Features, relations and constraints added to or removed from a feature model."""
+
+    def __init__(self, old_fm: FeatureModel, new_fm: FeatureModel) -> None:
+        old_features = {f.name for f in old_fm.get_features()} if old_fm is not None else set()
+        new_features = {f.name for f in new_fm.get_features()} if new_fm is not None else set()
+        old_relations = {relation_key(r): r for r in old_fm.get_relations()} if old_fm is not None else dict()
+        new_relations = {relation_key(r): r for r in new_fm.get_relations()} if new_fm is not None else dict()
+        old_constraints = {constraint_key(c): c for c in old_fm.get_constraints()} if old_fm is not None else dict()
+        new_constraints = {constraint_key(c): c for c in new_fm.get_constraints()} if new_fm is not None else dict()
+
+        self.added_features = new_features - old_features
+        self.removed_features = old_features - new_features
+        self.added_relations = [new_relations[r] for r in new_relations.keys() - old_relations.keys()]
+        self.removed_relations = [old_relations[r] for r in old_relations.keys() - new_relations.keys()]
+        self.added_constraints = [new_constraints[c] for c in new_constraints.keys() - old_constraints.keys()]
+        self.removed_constraints = [old_constraints[c] for c in old_constraints.keys() - new_constraints.keys()]
+
+    def is_empty(self) -> bool:
+        return not (self.added_features or self.removed_features or self.added_relations or self.removed_relations
+                    or self.added_constraints or self.removed_constraints)
+
+    def get_constraints_features(self) -> set[str]:
+        """Return the names of the features involved in the added or removed constraints."""
+        return {f for c in self.added_constraints + self.removed_constraints for f in c.get_features()}
+
+    def __str__(self) -> str:
+        return (f'+{len(self.added_features)}/-{len(self.removed_features)} features, '
+                f'+{len(self.added_relations)}/-{len(self.removed_relations)} relations, '
+                f'+{len(self.added_constraints)}/-{len(self.removed_constraints)} constraints')
+
+
+def get_dependency_groups(dependencies: dict[str, set[str]]) -> list[str]:
+    """Return the features leading a group of features related by cross-tree constraints, as in scenario 2.
+
+    The features are visited in order of name, and a feature already included in a previous group
+    does not lead a new group, so each group is reported once.
+    """
+    groups = []
+    analyzed_features = set()
+    for feature_name in sorted(dependencies):
+        if feature_name not in analyzed_features and dependencies[feature_name]:
+            groups.append(feature_name)
+            analyzed_features.add(feature_name)
+            analyzed_features.update(dependencies[feature_name])
+    return groups
+
+
+def diff_opinions(old_opinions: dict[str, dict[str, FMOpinion]], new_opinions: dict[str, dict[str, FMOpinion]]) -> dict[str, set[str]]:
+    """Return the elements whose opinion (or fusion operator) has been added, removed or changed for each stakeholder.
+
+    Added or removed stakeholders have all their elements changed.
+    """
+    changes = dict()
+    for stakeholder in old_opinions.keys() | new_opinions.keys():
+        old = old_opinions.get(stakeholder, dict())
+        new = new_opinions.get(stakeholder, dict())
+        changed = {e for e in old.keys() | new.keys()
+                   if e not in old or e not in new or opinion_key(old[e]) != opinion_key(new[e])}
+        if changed:
+            changes[stakeholder] = changed
+    return changes
+
+
+class IncrementalEngine():
+    """Keep the results of the three scenarios up to date across feature model releases and opinion edits.
+
+    The engine holds the fused opinion of each feature (scenario 1), the fused opinion of each group
+    of features related by cross-tree constraints (scenario 2), keyed by the feature leading the group, and the fused opinion of each product (scenario 3).
+    On each update, it diffs the new feature model and opinions against the previous ones and only recomputes:
+      - the fused opinions of the elements with changed cells,
+      - the dependency groups whose constraints changed or whose features have changed cells,
+      - the stakeholders' product opinions of the stakeholders with changed cells.
+    A product's opinion only depends on which features with opinions it selects, so product opinions
+    are cached by that selection and reused across releases of the feature model.
+    The selection of each product is only computed when the products are regenerated (i.e., the feature
+    model changes) or when the set of features with opinions changes, so editing a cell does not scan the products.
+    """
+
+    def __init__(self, fusion_operator: str) -> None:
+        self.fusion_operator = fusion_operator
+        self.fm = None
+        self.fm_diff = None
+        self.opinions = dict()
+        self.fused_opinions: dict[str, sbool] = dict()
+        self.dependencies: dict[str, set[str]] = dict()
+        self.group_opinions: dict[str, sbool] = dict()
+        self.products: list[Configuration] = []
+        self.selections: dict[Configuration, frozenset[str]] = dict()
+        self.distinct_selections: set[frozenset[str]] = set()
+        self.stakeholder_product_opinions: dict[tuple[str, frozenset[str]], sbool] = dict()
+        self.product_opinions: dict[frozenset[str], tuple[sbool, float]] = dict()
+
+    def update(self, fm: FeatureModel = None, opinions: dict[str, dict[str, FMOpinion]] = None) -> dict[str, int]:
+        """Update the feature model and/or the opinions and recompute the affected results.
+
+        The update is transactional: the new results are computed apart and only replace
+        the current ones if all of them are computed, so an update that raises an exception
+        (e.g., with an incomplete opinions file) leaves the engine as it was.
+        The differences with the previous feature model are kept in `fm_diff` (None if no feature model is given).
+        Return the number of recomputed fused opinions, dependency groups and product opinions.
+        """
+        fm_diff = FeatureModelDiff(self.fm, fm) if fm is not None else None
+        opinions_changes = diff_opinions(self.opinions, opinions) if opinions is not None else dict()
+        changed_elements = {e for elements in opinions_changes.values() for e in elements}
+        # If a stakeholder is added or removed, all fusions change
+        stakeholders_changed = opinions is not None and self.opinions.keys() != opinions.keys()
+        new_fm = fm if fm is not None else self.fm
+        new_opinions = opinions if opinions is not None else self.opinions
+
+        fused_opinions, n_fused_opinions = self._update_fused_opinions(new_opinions, changed_elements, stakeholders_changed)
+        dependencies, group_opinions, n_groups = self._update_dependency_groups(new_fm, new_opinions, fm_diff, changed_elements, stakeholders_changed)
+        products_changed = fm_diff is not None and not fm_diff.is_empty()
+        products = self._generate_products(new_fm) if products_changed else self.products
+        features = get_opinion_features(new_opinions)
+        if products_changed or features != get_opinion_features(self.opinions):
+            selections = {p: frozenset(f for f in p.get_selected_elements() if f in features) for p in products}
+            distinct_selections = set(selections.values())
+        else:
+            selections = self.selections
+            distinct_selections = self.distinct_selections
+        stakeholder_product_opinions, product_opinions, n_products = self._update_product_opinions(new_opinions, distinct_selections, opinions_changes)
+
+        self.fm = new_fm
+        self.fm_diff = fm_diff
+        self.opinions = new_opinions
+        self.fused_opinions = fused_opinions
+        self.dependencies = dependencies
+        self.group_opinions = group_opinions
+        self.products = products
+        self.selections = selections
+        self.distinct_selections = distinct_selections
+        self.stakeholder_product_opinions = stakeholder_product_opinions
+        self.product_opinions = product_opinions
+        return {'fused_opinions': n_fused_opinions, 'dependency_groups': n_groups, 'product_opinions': n_products}
+
+    def _update_fused_opinions(self, opinions: dict[str, dict[str, FMOpinion]], changed_elements: set[str], stakeholders_changed: bool) -> tuple[dict[str, sbool], int]:
+        features = get_opinion_features(opinions)
+        to_update = features if stakeholders_changed else changed_elements & features
+        fused_opinions = {e: op for e, op in self.fused_opinions.items() if e in features}
+        for element in to_update:
+            fused_opinions[element] = utils.get_fused_opinion_for_feature(element, opinions)
+        return fused_opinions, len(to_update)
+
+    def _update_dependency_groups(self, fm: FeatureModel, opinions: dict[str, dict[str, FMOpinion]], fm_diff: FeatureModelDiff, changed_elements: set[str], stakeholders_changed: bool) -> tuple[dict[str, set[str]], dict[str, sbool], int]:
+        if fm is None:
+            return self.dependencies, self.group_opinions, 0
+        features = {f for f in get_opinion_features(opinions) if fm.get_feature_by_name(f) is not None}
+        dependencies = {f: d for f, d in self.dependencies.items() if f in features}
+
+        # A dependency closure can only change if it reaches a feature of a changed constraint
+        if fm_diff is None:
+            to_close = features - dependencies.keys()
+        else:
+            changed_features = fm_diff.get_constraints_features() | fm_diff.added_features | fm_diff.removed_features
+            to_close = {f for f in features
+                        if f not in dependencies or f in changed_features or dependencies[f] & changed_features}
+        changed_groups = set()
+        for feature_name in to_close:
+            feature = fm.get_feature_by_name(feature_name)
+            # A feature in a cycle of constraints depends on itself, but it is already in its group
+            feature_dependencies = {f.name for f in fm_utils.get_feature_constraints_dependencies(fm, feature, set())} - {feature_name}
+            if feature_dependencies != dependencies.get(feature_name):
+                changed_groups.add(feature_name)
+            dependencies[feature_name] = feature_dependencies
+
+        # A group opinion changes if the group is new, its features changed or any of their opinions changed
+        groups = get_dependency_groups(dependencies)
+        group_opinions = {f: op for f, op in self.group_opinions.items() if f in groups}
+        if stakeholders_changed:
+            to_update = set(groups)
+        else:
+            to_update = {f for f in groups
+                         if f not in group_opinions or f in changed_groups or ({f} | dependencies[f]) & changed_elements}
+        for feature_name in to_update:
+            feature_dependencies = dependencies[feature_name]
+            involved_features = [fm.get_feature_by_name(feature_name)] + [fm.get_feature_by_name(f) for f in sorted(feature_dependencies)]
+            combined_opinions = [utils.get_opinions_for_related_features(involved_features, opinions[stakeholder]) for stakeholder in opinions]
+            fusion_operator = utils.get_fusion_operator_for_feature(feature_name, opinions)
+            group_opinions[feature_name] = FUSION_OPERATORS[fusion_operator](combined_opinions)
+        return dependencies, group_opinions, len(to_update)
+
+    def _generate_products(self, fm: FeatureModel) -> list[Configuration]:
+        return [Configuration({f: True for f in p}) for p in fm_utils.generate_products(fm)]
+
+    def _update_product_opinions(self, opinions: dict[str, dict[str, FMOpinion]], selections: set[frozenset[str]], opinions_changes: dict[str, set[str]]) -> tuple[dict[tuple[str, frozenset[str]], sbool], dict[frozenset[str], tuple[sbool, float]], int]:
+        # Drop the cached opinions of the stakeholders with changed cells and of the selections no longer present
+        stakeholder_product_opinions = {(stakeholder, selection): op for (stakeholder, selection), op in self.stakeholder_product_opinions.items()
+                                        if stakeholder in opinions and stakeholder not in opinions_changes and selection in selections}
+        if opinions_changes:
+            product_opinions = dict()
+        else:
+            product_opinions = {selection: v for selection, v in self.product_opinions.items() if selection in selections}
+
+        n_products = 0
+        fusion_operator = FUSION_OPERATORS[self.fusion_operator]
+        for selection in selections - product_opinions.keys():
+            product = Configuration({f: True for f in selection})
+            stakeholders_opinions = []
+            for stakeholder in opinions:
+                key = (stakeholder, selection)
+                if key not in stakeholder_product_opinions:
+                    stakeholder_product_opinions[key] = utils.get_product_opinion(product, opinions[stakeholder])
+                stakeholders_opinions.append(stakeholder_product_opinions[key])
+            fuse_opinion = fusion_operator(stakeholders_opinions)
+            product_opinions[selection] = (fuse_opinion, fuse_opinion.projection())
+            n_products += 1
+        return stakeholder_product_opinions, product_opinions, n_products
+
+    def rank_products(self, top_k: int = 0) -> list[tuple[Configuration, tuple[sbool, float]]]:
+        """Return the products ranked by projection, as in `utils.rank_products`."""
+        rank = ((p, self.product_opinions[self.selections[p]]) for p in self.products)
+        if top_k > 0:
+            return heapq.nlargest(top_k, rank, key=lambda x : x[1][1])
+        return sorted(rank, key=lambda x : x[1][1], reverse=True)
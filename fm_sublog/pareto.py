@@ -0,0 +1,128 @@
+import heapq
+import itertools
+from typing import Callable, Iterable
+
+from uncertainty.utypes import sbool
+
+from flamapy.metamodels.configuration_metamodel.models import Configuration
+
+from fm_sublog.models import FMOpinion
+from fm_sublog import utils
+
+
+def get_disagreement(product_opinions: list[sbool]) -> float:
+    """Return the mean degree of conflict between each pair of stakeholder's opinions about a product."""
+    pairs = list(itertools.combinations(product_opinions, 2))
+    if not pairs:
+        return 0.0
+    return sum(a.degreeOfConflict(b) for a, b in pairs) / len(pairs)
+
+
+# Each criterion maps the product, its fused opinion and the stakeholders' opinions to a value to be minimized.
+PARETO_CRITERIA = {'projection': lambda product, fuse_opinion, product_opinions: -fuse_opinion.projection(),
+                   'belief': lambda product, fuse_opinion, product_opinions: -fuse_opinion.belief,
+                   'disbelief': lambda product, fuse_opinion, product_opinions: fuse_opinion.disbelief,
+                   'uncertainty': lambda product, fuse_opinion, product_opinions: fuse_opinion.uncertainty,
+                   'size': lambda product, fuse_opinion, product_opinions: len(product.get_selected_elements()),
+                   'disagreement': lambda product, fuse_opinion, product_opinions: get_disagreement(product_opinions)}
+
+
+def _screen(candidates: list[tuple[float]], dominators: list[tuple[float]], k: int) -> list[tuple[float]]:
+    """Return the candidates that are not weakly dominated by any dominator in the criteria from `k` on.
+
+    The candidates are known to be weakly dominated by all dominators in the criteria before `k`.
+    Each call splits the points by the median of criterion `k`: the low candidates can only be
+    dominated by the low dominators, and the high candidates are dominated by the low dominators
+    in criterion `k`, so these are screened in the next criterion.
+    The last two criteria are solved with a sweep.
+    """
+    if not candidates or not dominators:
+        return candidates
+    n_criteria = len(candidates[0])
+    if k == n_criteria - 1:
+        best = min(d[k] for d in dominators)
+        return [c for c in candidates if c[k] < best]
+    if k == n_criteria - 2:
+        # On ties, dominators go first since weak dominance is enough
+        points = sorted([(d[k], 0, d) for d in dominators] + [(c[k], 1, c) for c in candidates], key=lambda p: (p[0], p[1]))
+        best = None
+        result = []
+        for _, is_candidate, values in points:
+            if not is_candidate:
+                best = values[k + 1] if best is None else min(best, values[k + 1])
+            elif best is None or values[k + 1] < best:
+                result.append(values)
+        return result
+
+    values_k = sorted({v[k] for v in candidates} | {v[k] for v in dominators})
+    if len(values_k) == 1:
+        return _screen(candidates, dominators, k + 1)
+    pivot = values_k[(len(values_k) - 1) // 2]
+    low_candidates = [c for c in candidates if c[k] <= pivot]
+    high_candidates = [c for c in candidates if c[k] > pivot]
+    low_dominators = [d for d in dominators if d[k] <= pivot]
+    high_dominators = [d for d in dominators if d[k] > pivot]
+    result = _screen(low_candidates, low_dominators, k)
+    high_candidates = _screen(high_candidates, low_dominators, k + 1)
+    return result + _screen(high_candidates, high_dominators, k)
+
+
+def _maxima(points: list[tuple[float]]) -> list[tuple[float]]:
+    """Kung's divide and conquer algorithm over lexicographically sorted and distinct points.
+
+    A point of the second half cannot dominate a point of the first half, and a point of the
+    first half dominates a point of the second half if it is not worse in the criteria from the second on.
+    """
+    if len(points) <= 1:
+        return points
+    middle = len(points) // 2
+    first = _maxima(points[:middle])
+    second = _maxima(points[middle:])
+    return first + _screen(second, first, 1)
+
+
+def skyline(points: list[tuple[tuple[float], object]]) -> list[tuple[tuple[float], object]]:
+    """Return the points not dominated by any other point, as (values, item) pairs.
+
+    With one or two criteria, the skyline is found with a single sweep over the points sorted
+    lexicographically, keeping the best value of the last criterion.
+    With three or more criteria, it uses Kung's divide and conquer algorithm, that takes
+    O(n log^(d-2) n) comparisons for d criteria instead of comparing the points pairwise,
+    also in the worst case where all the points are in the skyline.
+    Points with the same values are all kept.
+    """
+    items = dict()
+    for values, item in points:
+        items.setdefault(values, []).append(item)
+    distinct = sorted(items)
+    if not distinct:
+        return []
+    if len(distinct[0]) <= 2:
+        front = []
+        best = None
+        for values in distinct:
+            if best is None or values[-1] < best:
+                best = values[-1]
+                front.append(values)
+    else:
+        front = _maxima(distinct)
+    return [(values, item) for values in front for item in items[values]]
+
+
+def get_pareto_front(products: Iterable[Configuration], opinions: dict[str, dict[str, FMOpinion]], fusion_operator: Callable, criteria: list[str], top_k: int = 0) -> list[tuple[Configuration, tuple[sbool, float]]]:
+    """Given a list of products, return the products in the Pareto front (skyline) of the given criteria.
+
+    The products are returned as in `utils.rank_products`, ordered by projection.
+    If top_k is greater than 0, only the top_k products of the front with best projection are returned.
+    """
+    criteria_functions = [PARETO_CRITERIA[c] for c in criteria]
+    points = []
+    for product in products:
+        product_opinions = utils.get_product_opinions(product, opinions)
+        fuse_opinion = fusion_operator(product_opinions)
+        values = tuple(f(product, fuse_opinion, product_opinions) for f in criteria_functions)
+        points.append((values, (product, (fuse_opinion, fuse_opinion.projection()))))
+    front = [item for _, item in skyline(points)]
+    if top_k > 0:
+        return heapq.nlargest(top_k, front, key=lambda x: x[1][1])
+    return sorted(front, key=lambda x: x[1][1], reverse=True)
@@ -0,0 +1,139 @@
+import math
+from typing import Callable
+
+from uncertainty.utypes import sbool
+
+from flamapy.metamodels.configuration_metamodel.models import Configuration
+from flamapy.metamodels.bdd_metamodel.models import BDDModel
+
+from fm_sublog.models import FMOpinion
+from fm_sublog import utils
+
+
+class ProductStatistics():
+    """Exact aggregate statistics of the fused opinions over all products of a feature model.
+
+    The statistics are computed from the distribution of the fused opinions,
+    that is, a list of (fused opinion, projection, number of products) tuples,
+    so that they are exact without enumerating the products.
+    The mean, max and min projections are None if there are no products.
+    """
+
+    def __init__(self, distribution: list[tuple[sbool, float, int]]) -> None:
+        self.distribution = sorted(distribution, key=lambda x: x[1], reverse=True)
+
+    def n_products(self) -> int:
+        return sum(n for _, _, n in self.distribution)
+
+    def max_projection(self) -> float | None:
+        return self.distribution[0][1] if self.distribution else None
+
+    def min_projection(self) -> float | None:
+        return self.distribution[-1][1] if self.distribution else None
+
+    def mean_projection(self) -> float | None:
+        n_products = self.n_products()
+        if n_products == 0:
+            return None
+        return math.fsum(projection * n for _, projection, n in self.distribution) / n_products
+
+    def n_products_above(self, threshold: float) -> int:
+        """Return the number of products whose projection is greater than the threshold."""
+        return sum(n for _, projection, n in self.distribution if projection > threshold)
+
+    def projection_histogram(self, n_bins: int = 10) -> list[int]:
+        """Return the number of products in each of the `n_bins` buckets of equal width in [0, 1].
+
+        The last bucket is closed, so a projection of 1.0 falls in it.
+        """
+        if n_bins <= 0:
+            raise Exception(f'Invalid number of bins: {n_bins}')
+        histogram = [0] * n_bins
+        for _, projection, n in self.distribution:
+            histogram[min(int(projection * n_bins), n_bins - 1)] += n
+        return histogram
+
+
+def get_opinion_features_counts(bdd_model: BDDModel, features: list[str]) -> dict[frozenset[str], int]:
+    """Return the number of products for each selection of the given features.
+
+    The result maps each subset of `features` selected in at least one product to the number
+    of products that select exactly that subset (among the given features).
+    It is computed by dynamic programming over the BDD, annotating each node with the counts of
+    the partial selections below it, so the cost depends on the size of the BDD and on the number
+    of different selections of the given features, not on the number of products.
+    Features that are not variables of the BDD are never selected.
+    """
+    bdd = bdd_model.bdd
+    opinion_vars = [f for f in features if f in bdd.vars]
+    level_bits = {bdd.level_of_var(f): 1 << i for i, f in enumerate(opinion_vars)}
+
+    def expand(annotation: dict[int, int], from_level: int, to_level: int) -> dict[int, int]:
+        """Account for the free variables in the levels skipped from `from_level` to `to_level`."""
+        multiplier = 1
+        for level in range(from_level, to_level):
+            bit = level_bits.get(level)
+            if bit is None:
+                multiplier *= 2
+            else:
+                expanded = dict(annotation)
+                for mask, count in annotation.items():
+                    expanded[mask | bit] = count
+                annotation = expanded
+        if multiplier > 1:
+            annotation = {mask: count * multiplier for mask, count in annotation.items()}
+        return annotation
+
+    def children(u):
+        """Return the (low, high) successors of `u`, propagating complemented edges."""
+        if u.negated:
+            return (~u.low, ~u.high)
+        return (u.low, u.high)
+
+    annotations = {}
+    stack = [bdd_model.root]
+    while stack:
+        u = stack[-1]
+        if u in annotations:
+            stack.pop()
+            continue
+        if u.var is None:  # terminal node
+            annotations[u] = {0: 1} if u == bdd.true else {}
+            stack.pop()
+            continue
+        low, high = children(u)
+        pending = [c for c in (low, high) if c not in annotations]
+        if pending:
+            stack.extend(pending)
+            continue
+        stack.pop()
+        bit = level_bits.get(u.level, 0)
+        annotation = dict(expand(annotations[low], u.level + 1, low.level))
+        for mask, count in expand(annotations[high], u.level + 1, high.level).items():
+            annotation[mask | bit] = annotation.get(mask | bit, 0) + count
+        annotations[u] = annotation
+
+    root_annotation = expand(annotations[bdd_model.root], 0, bdd_model.root.level)
+    return {frozenset(f for i, f in enumerate(opinion_vars) if mask & (1 << i)): count
+            for mask, count in root_annotation.items() if count > 0}
+
+
+def get_fused_opinions_distribution(bdd_model: BDDModel, opinions: dict[str, dict[str, FMOpinion]], fusion_operator: Callable) -> list[tuple[sbool, float, int]]:
+    """Return the distribution of the fused opinions over all products of the BDD.
+
+    A product's opinion only depends on which of the features with opinions it selects,
+    so the fused opinion is computed once for each of those selections and weighted with
+    the number of products sharing it.
+    """
+    features = list({f for stakeholder in opinions.values() for f in stakeholder.keys()})
+    distribution = []
+    for selection, n_products in get_opinion_features_counts(bdd_model, features).items():
+        product = Configuration(elements={f: True for f in selection})
+        fuse_opinion = fusion_operator(utils.get_product_opinions(product, opinions))
+        distribution.append((fuse_opinion, fuse_opinion.projection(), n_products))
+    return distribution
+
+
+def get_product_statistics(bdd_model: BDDModel, opinions: dict[str, dict[str, FMOpinion]], fusion_operator: Callable) -> ProductStatistics:
+    """Return the exact aggregate statistics of the fused opinions over all products of the BDD."""
+    return ProductStatistics(get_fused_opinions_distribution(bdd_model, opinions, fusion_operator))
@@ -1,6 +1,7 @@
 import csv
 import functools
-from typing import Callable
+import heapq
+from typing import Callable, Iterable
 
 from uncertainty.utypes import *
 
@@ -77,18 +78,27 @@ def get_product_opinions(product: Configuration, opinions: dict[str, dict[str, F
     return [get_product_opinion(product, opinions[stakeholder]) for stakeholder in opinions]
 
 
-def rank_products(products: list[Configuration], opinions: dict[str, dict[str, FMOpinion]], fusion_operator: Callable) -> dict[Configuration, tuple[sbool, float]]:
-    """Given a list of products, return the products ranked by the projection based on the opinions of the stakeholders."""
+def rank_products(products: Iterable[Configuration], opinions: dict[str, dict[str, FMOpinion]], fusion_operator: Callable, top_k: int = 0) -> list[tuple[Configuration, tuple[sbool, float]]]:
+    """Given an iterable of products, return the products ranked by the projection based on the opinions of the stakeholders.
+    
+    If top_k is greater than 0, only the top_k best ranked products are returned,
+    keeping only those top_k products in memory while the products are scored."""
+    if top_k > 0:
+        return heapq.nlargest(top_k, ((product, get_fused_opinion_for_product(product, opinions, fusion_operator)) for product in products), key=lambda x : x[1][1])
+
     rank = dict()
     for product in products:
-        product_opinions = get_product_opinions(product, opinions)
-        fuse_opinion = fusion_operator(product_opinions)
-        projection = fuse_opinion.projection()        
-        rank[product] = (fuse_opinion, projection)
-    
+        rank[product] = get_fused_opinion_for_product(product, opinions, fusion_operator)
     return sorted(rank.items(), key=lambda x : x[1][1], reverse=True)
 
 
+def get_fused_opinion_for_product(product: Configuration, opinions: dict[str, dict[str, FMOpinion]], fusion_operator: Callable) -> tuple[sbool, float]:
+    """Return the fused opinion of the stakeholders about a product and its projection."""
+    product_opinions = get_product_opinions(product, opinions)
+    fuse_opinion = fusion_operator(product_opinions)
+    return (fuse_opinion, fuse_opinion.projection())
+
+
 def get_opinions_for_related_features(features: list[Feature], stakeholder_opinions: dict[str, FMOpinion]) -> sbool:
     """Return the opinion combination of a stakeholder for a list of related/dependent features, combining them using the AND operators."""
     features_op = [stakeholder_opinions[f.name].opinion for f in features if f.name in stakeholder_opinions]
@@ -0,0 +1,174 @@
+import csv
+import json
+import os
+import struct
+from abc import ABC, abstractmethod
+from typing import Iterable
+
+from uncertainty.utypes import sbool
+
+from flamapy.metamodels.configuration_metamodel.models import Configuration
+
+
+BUFFER_SIZE = 1 << 20  # 1 MiB
+
+BINARY_MAGIC = b'FMSL'
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct('<4sHI')  # magic, version, number of features
+BINARY_NAME_LENGTH = struct.Struct('<H')
+BINARY_OPINION = struct.Struct('<5d')  # projection, belief, disbelief, uncertainty, base rate
+
+
+class ResultWriter(ABC):
+    """Buffered sink for a ranking of products.
+
+    Products are written as they are produced, one per call to `write` or while iterating the
+    ranking given to `write_rank`, selected features are resolved through an index of feature names
+    shared by all products, and the writing stops after `top_k` products (0 means all the products).
+    Note that a ranking sorted by projection can only be produced once all products are scored,
+    so the output of a ranking starts when the ranking is complete.
+    Writers are context managers that flush and close the underlying file on exit.
+    """
+
+    def __init__(self, filepath: str, features: list[str], top_k: int = 0) -> None:
+        self.filepath = filepath
+        self.features = features
+        self.feature_index = {f: i for i, f in enumerate(features)}
+        self.top_k = top_k
+        self.n_written = 0
+        self.file = None
+
+    def open(self) -> None:
+        self.file = open(self.filepath, 'w', newline='', encoding='utf-8', buffering=BUFFER_SIZE)
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def is_full(self) -> bool:
+        return self.top_k > 0 and self.n_written >= self.top_k
+
+    def write(self, product: Configuration, opinion: sbool, projection: float) -> bool:
+        """Write the next product of the ranking. Return False if the top-k products were already written."""
+        if self.is_full():
+            return False
+        self.n_written += 1
+        self.write_product(self.n_written, self.get_selected_indexes(product), opinion, projection)
+        return True
+
+    def write_rank(self, rank: Iterable[tuple[Configuration, tuple[sbool, float]]]) -> None:
+        for product, (opinion, projection) in rank:
+            if not self.write(product, opinion, projection):
+                break
+
+    def get_selected_indexes(self, product: Configuration) -> list[int]:
+        return sorted(self.feature_index[f] for f in product.get_selected_elements() if f in self.feature_index)
+
+    @abstractmethod
+    def write_product(self, rank: int, selected: list[int], opinion: sbool, projection: float) -> None:
+        """Write a product given its rank and the indexes of its selected features."""
+
+    def __enter__(self) -> 'ResultWriter':
+        self.open()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class JSONLWriter(ResultWriter):
+    """One JSON object per line.
+
+    The first line holds the index of feature names, and the selected features of each product
+    are given as positions in that index.
+    """
+
+    def open(self) -> None:
+        super().open()
+        self.file.write(json.dumps({'features': self.features}) + '\n')
+
+    def write_product(self, rank: int, selected: list[int], opinion: sbool, projection: float) -> None:
+        self.file.write(json.dumps({'rank': rank,
+                                    'features': selected,
+                                    'opinion': [opinion.belief, opinion.disbelief, opinion.uncertainty, opinion.base_rate],
+                                    'projection': projection}))
+        self.file.write('\n')
+
+
+class CSVWriter(ResultWriter):
+    """One row per product, with the selected features separated by ';'."""
+
+    HEADER = ['Rank', 'Projection', 'Belief', 'Disbelief', 'Uncertainty', 'BaseRate', 'Features']
+
+    def open(self) -> None:
+        super().open()
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(self.HEADER)
+
+    def write_product(self, rank: int, selected: list[int], opinion: sbool, projection: float) -> None:
+        self.writer.writerow([rank, projection, opinion.belief, opinion.disbelief, opinion.uncertainty, opinion.base_rate,
+                              ';'.join(self.features[i] for i in selected)])
+
+
+class BinaryWriter(ResultWriter):
+    """Compact little-endian binary format.
+
+    The header is the magic number, the format version, the number of features and
+    the feature names (uint16 length + utf-8 bytes). Then, each product is a fixed-size record
+    of five doubles (projection, belief, disbelief, uncertainty, base rate) followed by
+    the bitset of its selected features. The rank is the position of the record.
+    """
+
+    def open(self) -> None:
+        self.file = open(self.filepath, 'wb', buffering=BUFFER_SIZE)
+        self.file.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, len(self.features)))
+        for name in self.features:
+            encoded_name = name.encode('utf-8')
+            self.file.write(BINARY_NAME_LENGTH.pack(len(encoded_name)))
+            self.file.write(encoded_name)
+        self.bitset_size = (len(self.features) + 7) // 8
+
+    def write_product(self, rank: int, selected: list[int], opinion: sbool, projection: float) -> None:
+        bitset = 0
+        for i in selected:
+            bitset |= 1 << i
+        self.file.write(BINARY_OPINION.pack(projection, opinion.belief, opinion.disbelief, opinion.uncertainty, opinion.base_rate))
+        self.file.write(bitset.to_bytes(self.bitset_size, 'little'))
+
+
+def read_binary_results(filepath: str) -> tuple[list[str], list[tuple[list[str], sbool, float]]]:
+    """Reader for rankings written by the BinaryWriter.
+
+    Return the list of feature names and the list of (selected features, fused opinion, projection) of each product in order.
+    """
+    with open(filepath, 'rb') as file:
+        magic, version, n_features = BINARY_HEADER.unpack(file.read(BINARY_HEADER.size))
+        if magic != BINARY_MAGIC or version != BINARY_VERSION:
+            raise Exception(f'Invalid binary results file: {filepath}')
+        features = []
+        for _ in range(n_features):
+            (length,) = BINARY_NAME_LENGTH.unpack(file.read(BINARY_NAME_LENGTH.size))
+            features.append(file.read(length).decode('utf-8'))
+        bitset_size = (n_features + 7) // 8
+        record_size = BINARY_OPINION.size + bitset_size
+        results = []
+        while record := file.read(record_size):
+            projection, b, d, u, a = BINARY_OPINION.unpack_from(record)
+            bitset = int.from_bytes(record[BINARY_OPINION.size:], 'little')
+            selected = [f for i, f in enumerate(features) if bitset & (1 << i)]
+            results.append((selected, sbool(b, d, u, a), projection))
+    return features, results
+
+
+RESULT_WRITERS = {'.jsonl': JSONLWriter,
+                  '.csv': CSVWriter,
+                  '.bin': BinaryWriter}
+
+
+def get_result_writer(filepath: str, features: list[str], top_k: int = 0) -> ResultWriter:
+    """Return the writer for the given output file according to its extension."""
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension not in RESULT_WRITERS:
+        raise Exception(f'Invalid output format {extension}. Use one of {[e for e in RESULT_WRITERS]}')
+    return RESULT_WRITERS[extension](filepath, features, top_k)
@@ -0,0 +1,93 @@
+import argparse
+import os
+import time
+
+from flamapy.metamodels.fm_metamodel.transformations import UVLReader
+
+from fm_sublog.models import FUSION_OPERATORS
+from fm_sublog import utils
+from fm_sublog import writers
+from fm_sublog.incremental import IncrementalEngine
+
+
+def print_results(engine: IncrementalEngine, recomputed: dict[str, int], output_path: str, top_k: int):
+    print(f'Recomputed: {recomputed["fused_opinions"]} fused opinions, {recomputed["dependency_groups"]} dependency groups, {recomputed["product_opinions"]} product opinions.')
+
+    print('FEATURES FUSED OPINIONS:')
+    for i, (feature_name, fused_opinion) in enumerate(sorted(engine.fused_opinions.items()), 1):
+        print(f'{i}: {feature_name}. Fused opinion: {fused_opinion} -> {fused_opinion.projection()}')
+
+    print('FEATURES WITH CROSS-TREE CONSTRAINTS:')
+    for i, (feature_name, fused_opinion) in enumerate(sorted(engine.group_opinions.items()), 1):
+        involved_features = ' AND '.join([feature_name] + sorted(engine.dependencies[feature_name]))
+        print(f'{i}: {involved_features}. Fused opinion: {fused_opinion} -> {fused_opinion.projection()}')
+
+    rank = engine.rank_products(top_k)
+    if output_path is not None:
+        # Write to a temporary file so the results are replaced at once
+        features = [f.name for f in engine.fm.get_features()]
+        tmp_path = f'{output_path}.tmp{os.path.splitext(output_path)[1]}'
+        with writers.get_result_writer(tmp_path, features, top_k) as writer:
+            writer.write_rank(rank)
+        os.replace(tmp_path, output_path)
+        print(f'PRODUCTS RANKING: {writer.n_written} of {len(engine.products)} products written to {output_path}')
+    else:
+        print(f'PRODUCTS RANKING ({len(engine.products)} products):')
+        for i, (p, v) in enumerate(rank, 1):
+            print(f'{i}. {p.get_selected_elements()}: {v[0]} -> {v[1]}')
+
+
+def main(fm_paths: list[str], opinions_path: str, fusion_operator: str, strong_opinions: bool, output_path: str, top_k: int, watch: bool, interval: float):
+    engine = IncrementalEngine(fusion_operator)
+    opinions = utils.read_opinions(opinions_path, strong_opinions)
+    opinions_mtime = os.path.getmtime(opinions_path)
+
+    # Evaluate the opinions against each release in turn
+    for fm_path in fm_paths:
+        fm = UVLReader(fm_path).transform()
+        recomputed = engine.update(fm, opinions)
+        print(f'=== {fm_path} ({engine.fm_diff})')
+        print_results(engine, recomputed, output_path, top_k)
+
+    if not watch:
+        return
+
+    print(f'Watching {opinions_path} for changes (Ctrl+C to stop)...')
+    try:
+        while True:
+            time.sleep(interval)
+            mtime = os.path.getmtime(opinions_path)
+            if mtime == opinions_mtime:
+                continue
+            opinions_mtime = mtime
+            try:
+                opinions = utils.read_opinions(opinions_path, strong_opinions)
+                recomputed = engine.update(opinions=opinions)
+            except Exception as e:  # e.g., the file is being edited
+                print(f'Invalid opinions in {opinions_path}: {e}')
+                continue
+            print(f'=== {opinions_path} changed')
+            print_results(engine, recomputed, output_path, top_k)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Incremental evaluation of the stakeholder's opinions against a sequence of feature model releases. Only the fused opinions, dependency groups and product opinions affected by the changes between releases, or by the edits of the opinions, are recomputed.")
+    parser.add_argument('-fm', '--featuremodels', dest='feature_models', type=str, nargs='+', required=True, help='Feature model releases (.uvl), evaluated in the given order.')
+    parser.add_argument('-o', '--opinions', dest='opinions', type=str, required=True, help="Stakeholders' opinions (.csv).")
+    parser.add_argument('-f', '--fusion_operator', dest='fusion_operator', type=str, required=False, default='ABF', help=f'Fusion operator for the products: {[f for f in FUSION_OPERATORS.keys()]} (default ABF). ')
+    parser.add_argument('-s', '--strong_opinions', dest='strong_opinions', action='store_true', required=False, default=False, help="Consider strong degrees of uncertainty for stakelholder's opinions (default moderate).")
+    parser.add_argument('-out', '--output', dest='output', type=str, required=False, default=None, help=f'Output file for the ranking, in the format given by its extension: {[e for e in writers.RESULT_WRITERS]} (default print the ranking).')
+    parser.add_argument('-k', '--top_k', dest='top_k', type=int, required=False, default=0, help='Number of best ranked products to output (default all).')
+    parser.add_argument('-w', '--watch', dest='watch', action='store_true', required=False, default=False, help='After the last release, keep watching the opinions file and update the results when it changes.')
+    parser.add_argument('-i', '--interval', dest='interval', type=float, required=False, default=1.0, help='Seconds between checks of the opinions file in watch mode (default 1.0).')
+    args = parser.parse_args()
+
+    if args.fusion_operator not in FUSION_OPERATORS:
+        exit(f'Invalid fusion operator {args.fusion_operator}. Use one of {[f for f in FUSION_OPERATORS]}')
+
+    if args.output is not None and os.path.splitext(args.output)[1].lower() not in writers.RESULT_WRITERS:
+        exit(f'Invalid output format {args.output}. Use one of {[e for e in writers.RESULT_WRITERS]}')
+
+    main(args.feature_models, args.opinions, args.fusion_operator, args.strong_opinions, args.output, args.top_k, args.watch, args.interval)
@@ -1,5 +1,7 @@
 import argparse
+import os
 
+from flamapy.metamodels.configuration_metamodel.models import Configuration
 from flamapy.metamodels.fm_metamodel.transformations import UVLReader
 
 from uncertainty.utypes import *
@@ -7,19 +9,30 @@ from uncertainty.utypes import *
 from fm_sublog.models import FUSION_OPERATORS
 from fm_sublog import utils
 from fm_sublog import fm_utils
+from fm_sublog import pareto
+from fm_sublog import writers
 
 
-def main(fm_path: str, opinions_path: str, n_products: int, fusion_operator: str, strong_opinions: bool):
+def main(fm_path: str, opinions_path: str, n_products: int, fusion_operator: str, strong_opinions: bool, output_path: str, top_k: int, pareto_criteria: list[str]):
     fm = UVLReader(fm_path).transform()
     opinions = utils.read_opinions(opinions_path, strong_opinions)
     
-    # Generate products
-    products = fm_utils.generate_products(fm, n_products)
-    rank = utils.rank_products(products, opinions, FUSION_OPERATORS[fusion_operator])
-
-    print('PRODUCTS RANKING:')
-    for i, (p, v) in enumerate(rank, 1):
-        print(f'{i}. {[f for f in p.get_selected_elements()]}: {v[0]} -> {v[1]}')
+    # Generate products (the solver returns all of them, but their configurations are built and scored one by one)
+    products =(Configuration({f: True for f in p}) for p in fm_utils.generate_products(fm, n_products))
+    if pareto_criteria:
+        rank = pareto.get_pareto_front(products, opinions, FUSION_OPERATORS[fusion_operator], pareto_criteria, top_k)
+    else:
+        rank = utils.rank_products(products, opinions, FUSION_OPERATORS[fusion_operator], top_k)
+
+    if output_path is not None:
+        features = [f.name for f in fm.get_features()]
+        with writers.get_result_writer(output_path, features, top_k) as writer:
+            writer.write_rank(rank)
+        print(f'PRODUCTS RANKING: {writer.n_written} products written to {output_path}')
+    else:
+        print('PRODUCTS RANKING:')
+        for i, (p, v) in enumerate(rank, 1):
+            print(f'{i}. {p.get_selected_elements()}: {v[0]} -> {v[1]}')
     
 
 if __name__ == '__main__':
@@ -29,9 +42,18 @@ if __name__ == '__main__':
     parser.add_argument('-n', '--n_products', dest='n_products', type=int, required=False, default=0, help='Number of products to rank (default all).')
     parser.add_argument('-f', '--fusion_operator', dest='fusion_operator', type=str, required=False, default='ABF', help=f'Fusion operator: {[f for f in FUSION_OPERATORS.keys()]} (default ABF). ')
     parser.add_argument('-s', '--strong_opinions', dest='strong_opinions', action='store_true', required=False, default=False, help="Consider strong degrees of uncertainty for stakelholder's opinions (default moderate).")
+    parser.add_argument('-out', '--output', dest='output', type=str, required=False, default=None, help=f'Output file for the ranking, in the format given by its extension: {[e for e in writers.RESULT_WRITERS]} (default print the ranking).')
+    parser.add_argument('-k', '--top_k', dest='top_k', type=int, required=False, default=0, help='Number of best ranked products to output (default all).')
+    parser.add_argument('-p', '--pareto', dest='pareto', type=str, nargs='+', required=False, default=None, help=f'Return only the Pareto front of the products for the given criteria: {[c for c in pareto.PARETO_CRITERIA]} (default rank all products by projection).')
     args = parser.parse_args()
 
     if args.fusion_operator not in FUSION_OPERATORS:
         exit(f'Invalid fusion operator {args.fusion_operator}. Use one of {[f for f in FUSION_OPERATORS]}')
+
+    if args.pareto is not None and any(c not in pareto.PARETO_CRITERIA for c in args.pareto):
+        exit(f'Invalid Pareto criteria {args.pareto}. Use some of {[c for c in pareto.PARETO_CRITERIA]}')
+
+    if args.output is not None and os.path.splitext(args.output)[1].lower() not in writers.RESULT_WRITERS:
+        exit(f'Invalid output format {args.output}. Use one of {[e for e in writers.RESULT_WRITERS]}')
         
-    main(args.feature_model, args.opinions, args.n_products, args.fusion_operator, args.strong_opinions)
+    main(args.feature_model, args.opinions, args.n_products, args.fusion_operator, args.strong_opinions, args.output, args.top_k, args.pareto)